@@ -3,55 +3,51 @@
 Setup script for Image Canvas Workspace API with Style Analysis
 """
 
+import importlib.util
 import os
 import sys
 import shutil
 
 def main():
     """Set up the backend environment"""
-    print("🔧 Setting up Image Canvas Workspace Backend...")
-    
+    # Collect output and write it once at the end; a print per status line
+    # is a syscall per line under TTY line buffering
+    lines = ["🔧 Setting up Image Canvas Workspace Backend..."]
+
     # Check if we're in the backend directory
     if not os.path.exists('main.py'):
-        print("❌ Error: Please run this script from the backend/ directory")
+        sys.stdout.write(lines[0] + "\n❌ Error: Please run this script from the backend/ directory\n")
         sys.exit(1)
-    
-    # Create .env file from template if it doesn't exist
-    if not os.path.exists('.env'):
-        if os.path.exists('env.config'):
-            try:
-                shutil.copy('env.config', '.env')
-                print("✅ Created .env file from env.config template")
-            except Exception as e:
-                print(f"⚠️ Could not create .env file: {e}")
-                print("💡 You can manually copy env.config to .env")
-        else:
-            print("⚠️ env.config template not found")
-    else:
-        print("✅ .env file already exists")
-    
-    # Check Python dependencies
-    try:
-        import daft
-        print("✅ Daft is installed")
-    except ImportError:
-        print("❌ Daft not installed - run: pip install -r requirements.txt")
-        
-    try:
-        import transformers
-        print("✅ Transformers is installed")
-    except ImportError:
-        print("❌ Transformers not installed - run: pip install -r requirements.txt")
-        
+
+    # Create .env from the template through an exclusive open: it atomically
+    # creates the file or reports it already exists, with no stat-then-create
+    # race. Deliberately a copy, not a hardlink — .env holds secrets and must
+    # not share an inode with the git-tracked template
     try:
-        import fastapi
-        print("✅ FastAPI is installed")
-    except ImportError:
-        print("❌ FastAPI not installed - run: pip install -r requirements.txt")
-    
-    print("\n🚀 Setup complete!")
-    print("📍 To start the server: python start.py")
-    print("📖 Documentation: http://localhost:8001/docs")
-    
+        with open('env.dist') as src, open('.env', 'x') as dst:
+            shutil.copyfileobj(src, dst)
+        lines.append("✅ Created .env file from env.dist template")
+    except FileExistsError:
+        lines.append("✅ .env file already exists")
+    except FileNotFoundError:
+        lines.append("⚠️ env.dist template not found")
+    except Exception as e:
+        lines.append(f"⚠️ Could not create .env file: {e}")
+        lines.append("💡 You can manually copy env.dist to .env")
+
+    # Check Python dependencies without importing them: find_spec probes
+    # sys.path only, so the check skips transformers' slow torch import
+    for module, label in (("daft", "Daft"), ("transformers", "Transformers"), ("fastapi", "FastAPI")):
+        if importlib.util.find_spec(module) is not None:
+            lines.append(f"✅ {label} is installed")
+        else:
+            lines.append(f"❌ {label} not installed - run: pip install -r requirements.txt")
+
+    lines.append("\n🚀 Setup complete!")
+    lines.append("📍 To start the server: python start.py")
+    lines.append("📖 Documentation: http://localhost:8001/docs")
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
 if __name__ == "__main__":
     main()
@@ -3,33 +3,73 @@
 Startup script for Image Canvas Workspace API with Style Analysis
 """
 
-import uvicorn
 import os
 import sys
 
 def main():
     """Start the FastAPI server"""
     try:
-        print("🚀 Starting Image Canvas Workspace API with Style Analysis...")
-        print("📍 Server will be available at: http://localhost:8001")
-        print("📖 API docs available at: http://localhost:8001/docs")
-        print("🔌 WebSocket endpoint: ws://localhost:8001/ws/{canvas_id}")
-        print("🎨 Style analysis with Daft + LLM integration")
-        
-        # Check if HF_TOKEN is available
+        # Parametrized so one entrypoint serves every deployment; defaults
+        # match env.dist
+        host = os.getenv("HOST", "0.0.0.0")
+        port = int(os.getenv("PORT", "8001"))
+        app = os.getenv("APP", "main:app")
+
+        # One buffered write instead of a print-per-line banner
+        banner = [
+            "🚀 Starting Image Canvas Workspace API with Style Analysis...",
+            f"📍 Server will be available at: http://localhost:{port}",
+            f"📖 API docs available at: http://localhost:{port}/docs",
+            f"🔌 WebSocket endpoint: ws://localhost:{port}/ws/{{canvas_id}}",
+            "🎨 Style analysis with Daft + LLM integration",
+        ]
         if os.getenv("HF_TOKEN"):
-            print("✅ HF_TOKEN found in environment")
+            banner.append("✅ HF_TOKEN found in environment")
         else:
-            print("⚠️ HF_TOKEN not found - some models may not be accessible")
-        
-        print("\n⚡ Starting server...")
-        
+            banner.append("⚠️ HF_TOKEN not found - some models may not be accessible")
+        banner.append("\n⚡ Starting server...")
+        sys.stdout.write("\n".join(banner) + "\n")
+        sys.stdout.flush()
+
+        # uvloop + httptools (bundled with uvicorn[standard]) cut per-request
+        # overhead versus the pure-Python asyncio loop and h11 parser
+        prod = os.getenv("ENV") == "prod"
+        if prod:
+            # gunicorn as the process manager, but one worker by default:
+            # canvas/chat/connection state and the Daft DataFrame are all
+            # process-local, so extra workers split the app into islands
+            # that don't see each other's canvases or broadcasts. Raise
+            # WEB_CONCURRENCY only once that state is externalized.
+            # --preload imports main (and its heavy daft/transformers
+            # deps) once before forking, shared copy-on-write
+            workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+            if workers > 1:
+                sys.stderr.write(
+                    "⚠️ WEB_CONCURRENCY > 1: canvas, chat and analysis state "
+                    "is in-memory per worker; clients routed to different "
+                    "workers will not share canvases or broadcasts\n"
+                )
+            os.execvp("gunicorn", [
+                "gunicorn", app,
+                "-k", "uvicorn.workers.UvicornWorker",
+                "-w", str(workers),
+                "-b", f"{host}:{port}",
+                "--preload",
+            ])
+        # Dev path: single process with auto-reload. Imported here so the
+        # banner/env checks (and the gunicorn exec above) never pay for
+        # uvicorn's click/h11/websockets import graph
+        import uvicorn
+
         uvicorn.run(
-            "main:app",
-            host="0.0.0.0",
-            port=8001,  # Use different port to avoid conflicts
+            app,
+            host=host,
+            port=port,  # Defaults to 8001 to avoid conflicts
             reload=True,  # Auto-reload on file changes
-            log_level="info"
+            log_level="info",
+            loop="uvloop",
+            http="httptools",
+            ws="websockets",
         )
     except KeyboardInterrupt:
         print("\n👋 Shutting down server...")
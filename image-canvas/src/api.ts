@@ -9,6 +9,39 @@ export class CanvasAPI {
   private onCanvasUpdate?: (canvasState: CanvasState) => void;
   private onChatMessage?: (message: ChatMessage) => void;
   private onUserJoined?: (message: string) => void;
+  private lastCanvasState: CanvasState | null = null;
+
+  // Apply a server-side canvas_patch (list of ops) to the last known state
+  private applyCanvasPatch(ops: any[]): CanvasState | null {
+    const state = this.lastCanvasState;
+    if (!state) {
+      return null;
+    }
+    for (const op of ops) {
+      switch (op.op) {
+        case 'add':
+          state.images.push(op.image);
+          break;
+        case 'remove':
+          state.images = state.images.filter(img => img.id !== op.id);
+          break;
+        case 'move': {
+          const img = state.images.find(i => i.id === op.id);
+          if (img) {
+            Object.assign(img, op.changes);
+          }
+          break;
+        }
+        case 'groups':
+          state.groups = op.groups;
+          break;
+        case 'viewport':
+          state.viewport = op.viewport;
+          break;
+      }
+    }
+    return state;
+  }
 
   // Canvas Management
   async createCanvas(): Promise<CanvasState> {
@@ -218,13 +251,28 @@ export class CanvasAPI {
         switch (message.type) {
           case 'canvas_state':
           case 'canvas_update':
+            this.lastCanvasState = message.data;
             callbacks.onCanvasUpdate?.(message.data);
             break;
-          
+
+          case 'canvas_patch': {
+            const patched = this.applyCanvasPatch(message.data.ops);
+            if (patched) {
+              callbacks.onCanvasUpdate?.(patched);
+            }
+            break;
+          }
+
           case 'chat_message':
             callbacks.onChatMessage?.(message.data);
             break;
-          
+
+          case 'chat_batch':
+            for (const chat of message.data.messages) {
+              callbacks.onChatMessage?.(chat);
+            }
+            break;
+
           case 'user_joined':
             callbacks.onUserJoined?.(message.data.message);
             break;